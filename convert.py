@@ -1,19 +1,64 @@
 #!/usr/bin/env python3
 
 import os
+import io
+import json
+import shutil
 import argparse
+import asyncio
+import functools
 import subprocess
 import sys
+import uuid
+from collections import defaultdict, deque
 from colorama import init, Fore, Style
+from tqdm import tqdm
+
+# Only use colors when writing to a terminal, piped output stays plain and skips colorama's wrapper
+_USE_COLOR = sys.stdout.isatty()
 
 # Initialize colorama for cross-platform color support
-init()
+if _USE_COLOR:
+    init()
+
+class C:
+    """Color codes used in output, empty strings when colors are disabled"""
+    BLUE = Fore.BLUE if _USE_COLOR else ""
+    CYAN = Fore.CYAN if _USE_COLOR else ""
+    GREEN = Fore.GREEN if _USE_COLOR else ""
+    RED = Fore.RED if _USE_COLOR else ""
+    WHITE = Fore.WHITE if _USE_COLOR else ""
+    YELLOW = Fore.YELLOW if _USE_COLOR else ""
+    RESET = Style.RESET_ALL if _USE_COLOR else ""
 
 # Program information
 PROGRAM_NAME = "ConvF Music"
 VERSION = "1.0.0"
 DESCRIPTION = "Universal audio format conversion utility"
 
+# Width of the text area inside the banner and summary boxes
+BOX_WIDTH = 42
+
+# Name of the per-user cache directory
+CACHE_DIR_NAME = "convf-music"
+
+# Resolve FFmpeg on the PATH once instead of on every call
+FFMPEG_PATH = shutil.which("ffmpeg")
+FFMPEG = FFMPEG_PATH or "ffmpeg"
+FFPROBE_PATH = shutil.which("ffprobe")
+
+# FFmpeg options that limit its log to errors and report progress on stderr
+FFMPEG_LOG_ARGS = ["-nostats", "-loglevel", "error", "-progress", "pipe:2"]
+
+# Output options that drop video (e.g. embedded cover art), subtitle and data streams
+AUDIO_ONLY_ARGS = ["-vn", "-sn", "-dn"]
+
+# Number of FFmpeg log lines kept and shown when a conversion fails
+ERROR_TAIL_LINES = 5
+
+# Maximum number of files converted by a single FFmpeg process in folder mode
+MAX_BATCH_SIZE = 16
+
 # Common audio formats that FFmpeg supports
 COMMON_AUDIO_FORMATS = [
     # Lossy formats
@@ -24,58 +69,317 @@ COMMON_AUDIO_FORMATS = [
     ".ac3", ".amr", ".au", ".mid", ".mka", ".ra", ".shn"
 ]
 
+# Codec arguments for each output format, kept immutable so callers can't alter them
+_FORMAT_CODEC = {
+    ".mp3": ("-c:a", "libmp3lame", "-q:a", "4"),
+    ".ogg": ("-c:a", "libvorbis", "-q:a", "5"),
+    ".opus": ("-c:a", "libopus", "-b:a", "128k"),
+    ".m4a": ("-c:a", "aac", "-b:a", "192k"),
+    ".flac": ("-c:a", "flac"),
+    ".wav": ("-c:a", "pcm_s16le"),
+    ".aac": ("-c:a", "aac", "-b:a", "192k"),
+    ".wma": ("-c:a", "wmav2", "-b:a", "192k"),
+    ".alac": ("-c:a", "alac"),
+}
+
+# Codec name reported by FFprobe for each encoder in _FORMAT_CODEC
+_ENCODER_CODEC = {
+    "libmp3lame": "mp3",
+    "libvorbis": "vorbis",
+    "libopus": "opus",
+    "aac": "aac",
+    "flac": "flac",
+    "pcm_s16le": "pcm_s16le",
+    "wmav2": "wmav2",
+    "alac": "alac",
+}
+
+# Input extensions whose container can hold each codec, only these inputs are probed
+_CODEC_CONTAINERS = {
+    "mp3": frozenset({".mp3", ".mka"}),
+    "vorbis": frozenset({".ogg", ".mka"}),
+    "opus": frozenset({".ogg", ".opus", ".mka"}),
+    "aac": frozenset({".m4a", ".aac", ".mka"}),
+    "flac": frozenset({".flac", ".ogg", ".mka"}),
+    "pcm_s16le": frozenset({".wav", ".mka"}),
+    "wmav2": frozenset({".wma"}),
+    "alac": frozenset({".m4a", ".mka"}),
+}
+
+# Allowed relative difference between the source and requested bitrate for a stream copy
+BITRATE_TOLERANCE = 0.1
+
+# Extension sets for fast lookups when scanning folders
+AUDIO_EXT_SET = frozenset(COMMON_AUDIO_FORMATS)
+NON_AUDIO_EXT_SET = frozenset({".txt", ".jpg", ".png", ".pdf", ".doc", ".docx", ".exe", ".zip"})
+
+def _box_line(text, color=""):
+    """Format a line of text padded to fit inside a box"""
+    return f"║ {color}{text:<{BOX_WIDTH - 1}}{C.CYAN}║"
+
+def _box_row(label, value, color):
+    """Format a label and a colored value padded to fit inside a box"""
+    return f"║ {C.WHITE}{label:<16}{color}{value:<{BOX_WIDTH - 17}}{C.CYAN}║"
+
 def print_banner():
-    """Print a stylized banner for the program"""
-    banner = f"""
-{Fore.CYAN}╔══════════════════════════════════════════╗
-║ {Fore.GREEN}ConvF Music {VERSION}{Fore.CYAN}                      ║
-║ {Fore.WHITE}Universal Audio Format Converter{Fore.CYAN}          ║
-╚══════════════════════════════════════════╝{Style.RESET_ALL}
-"""
-    print(banner)
+    """Print a stylized banner for the program when running in a terminal"""
+    if not _USE_COLOR:
+        return
+    
+    banner = [
+        "",
+        f"{C.CYAN}╔{'═' * BOX_WIDTH}╗",
+        _box_line(f"{PROGRAM_NAME} {VERSION}", C.GREEN),
+        _box_line("Universal Audio Format Converter", C.WHITE),
+        f"╚{'═' * BOX_WIDTH}╝{C.RESET}",
+        "",
+    ]
+    sys.stdout.write("\n".join(banner) + "\n")
 
+# Messages go through tqdm.write so they don't break an active progress bar
 def print_info(message):
-    print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {message}")
+    tqdm.write(f"{C.BLUE}[INFO]{C.RESET} {message}")
 
 def print_warn(message):
-    print(f"{Fore.YELLOW}[WARN]{Style.RESET_ALL} {message}")
+    tqdm.write(f"{C.YELLOW}[WARN]{C.RESET} {message}")
 
 def print_error(message):
-    print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {message}")
+    tqdm.write(f"{C.RED}[ERROR]{C.RESET} {message}")
 
 def print_success(message):
-    print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {message}")
+    tqdm.write(f"{C.GREEN}[SUCCESS]{C.RESET} {message}")
+
+def get_cache_dir():
+    """Get the per-user cache directory for the program"""
+    if sys.platform == "win32":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base_dir = os.path.expanduser("~/Library/Caches")
+    else:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base_dir, CACHE_DIR_NAME)
+
+def _get_ffmpeg_caps():
+    """Probe the installed FFmpeg, reusing the cached result while the binary is unchanged"""
+    if FFMPEG_PATH is None:
+        return None
+    
+    try:
+        stat = os.stat(FFMPEG_PATH)
+    except OSError:
+        return None
+    cache_key = [FFMPEG_PATH, stat.st_mtime_ns, stat.st_size]
+    cache_file = os.path.join(get_cache_dir(), "ffmpeg_caps.json")
+    
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            caps = json.load(f)
+        if (isinstance(caps, dict) and caps.get("key") == cache_key
+                and "version_ok" in caps and "formats" in caps):
+            return caps
+    except (OSError, ValueError):
+        pass
+    
+    try:
+        version = subprocess.run([FFMPEG, "-version"], capture_output=True, text=True)
+        formats = subprocess.run([FFMPEG, "-formats"], capture_output=True, text=True)
+    except OSError:
+        return None
+    
+    caps = {
+        "key": cache_key,
+        "version_ok": version.returncode == 0,
+        "formats": formats.stdout,
+    }
+    
+    # A missing or read-only cache directory only costs a re-probe next time
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(caps, f)
+        os.replace(temp_file, cache_file)
+    except (OSError, ValueError):
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+    
+    return caps
 
 def get_ffmpeg_formats():
     """Get a list of audio formats supported by the installed FFmpeg"""
+    caps = _get_ffmpeg_caps()
+    return caps["formats"] if caps else None
+
+@functools.lru_cache(maxsize=None)
+def get_output_codec(output_format):
+    """Get the appropriate codec for the output format"""
+    # Return codec settings if found in the map, otherwise use the default codec for that format
+    return _FORMAT_CODEC.get(output_format.lower(), ("-c:a", "copy"))
+
+def get_codec_settings(output_format, quality=None, threads=0):
+    """Get the codec arguments for the output format with the quality and thread count applied"""
+    codec_settings = list(get_output_codec(output_format))
+    
+    # Add quality parameter if applicable
+    if "-q:a" in codec_settings and quality is not None:
+        q_index = codec_settings.index("-q:a")
+        if q_index + 1 < len(codec_settings):
+            codec_settings[q_index + 1] = str(quality)
+    
+    # 0 lets FFmpeg pick a thread count, encoders otherwise often default to one thread
+    codec_settings.extend(["-threads", str(threads)])
+    
+    return codec_settings
+
+def _handle_ffmpeg_line(line, log_tail, on_progress):
+    """Pass a progress report from FFmpeg to on_progress, or keep a log line in log_tail"""
+    line = line.rstrip()
+    key, separator, value = line.partition("=")
+    if separator and key.isidentifier():
+        # Progress reports are key=value lines
+        if key == "out_time" and on_progress:
+            on_progress(value)
+    elif line:
+        log_tail.append(line)
+
+def _run_ffmpeg(ffmpeg_cmd, on_progress=None):
+    """Run an FFmpeg command built with FFMPEG_LOG_ARGS
+    
+    stderr is read line by line as FFmpeg writes it, passing each reported
+    output time to on_progress and keeping only the most recent log lines.
+    Returns the exit code and those log lines.
+    """
+    log_tail = deque(maxlen=ERROR_TAIL_LINES)
+    process = subprocess.Popen(
+        ffmpeg_cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        bufsize=io.DEFAULT_BUFFER_SIZE,
+        text=True,
+        errors="replace"
+    )
+    
+    with process:
+        for line in process.stderr:
+            _handle_ffmpeg_line(line, log_tail, on_progress)
+    
+    return process.returncode, log_tail
+
+async def _run_ffmpeg_async(ffmpeg_cmd, on_progress=None):
+    """Run an FFmpeg command built with FFMPEG_LOG_ARGS without blocking the event loop
+    
+    Same as _run_ffmpeg, so several conversions can run side by side.
+    """
+    log_tail = deque(maxlen=ERROR_TAIL_LINES)
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    async for line in process.stderr:
+        _handle_ffmpeg_line(line.decode(errors="replace"), log_tail, on_progress)
+    await process.wait()
+    
+    return process.returncode, log_tail
+
+def _probe_command(input_file):
+    """Build the FFprobe command reading the codec and bitrate of a file's first audio stream"""
+    return [FFPROBE_PATH, "-v", "error", "-select_streams", "a:0",
+            "-show_entries", "stream=codec_name,bit_rate", "-of", "json", input_file]
+
+def _parse_probe(output):
+    """Get the codec name and bitrate from FFprobe's JSON output, or None if it can't tell"""
     try:
-        result = subprocess.run(
-            ["ffmpeg", "-formats"],
-            capture_output=True,
-            text=True
+        stream = json.loads(output)["streams"][0]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    
+    bit_rate = stream.get("bit_rate", "")
+    return stream.get("codec_name"), int(bit_rate) if bit_rate.isdigit() else None
+
+@functools.lru_cache(maxsize=None)
+def _probe(input_file):
+    """Get the codec name and bitrate of a file's first audio stream, or None if FFprobe can't tell"""
+    try:
+        result = subprocess.run(_probe_command(input_file), capture_output=True, text=True)
+    except OSError:
+        return None
+    return _parse_probe(result.stdout)
+
+async def _probe_async(input_file):
+    """Async counterpart of _probe, so probing doesn't hold up conversions running alongside"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_probe_command(input_file),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
         )
-        return result.stdout
-    except Exception:
+        output, _ = await process.communicate()
+    except OSError:
         return None
+    return _parse_probe(output.decode(errors="replace"))
 
-def get_output_codec(output_format):
-    """Get the appropriate codec for the output format"""
-    format_codec_map = {
-        ".mp3": ["-c:a", "libmp3lame", "-q:a", "4"],
-        ".ogg": ["-c:a", "libvorbis", "-q:a", "5"],
-        ".opus": ["-c:a", "libopus", "-b:a", "128k"],
-        ".m4a": ["-c:a", "aac", "-b:a", "192k"],
-        ".flac": ["-c:a", "flac"],
-        ".wav": ["-c:a", "pcm_s16le"],
-        ".aac": ["-c:a", "aac", "-b:a", "192k"],
-        ".wma": ["-c:a", "wmav2", "-b:a", "192k"],
-        ".alac": ["-c:a", "alac"],
-    }
+def _parse_bitrate(value):
+    """Convert an FFmpeg bitrate such as 192k to bits per second"""
+    multipliers = {"k": 1000, "m": 1000000}
+    suffix = value[-1:].lower()
+    if suffix in multipliers:
+        return int(float(value[:-1]) * multipliers[suffix])
+    return int(value)
+
+def _copy_candidate_codec(input_file, codec_settings):
+    """Get the target codec if the file could be stream-copied and is worth probing, otherwise None
     
-    # Return codec settings if found in the map, otherwise use the default codec for that format
-    return format_codec_map.get(output_format.lower(), ["-c:a", "copy"])
+    Formats set by quality (-q:a) are always re-encoded so the requested quality is honoured.
+    """
+    target_codec = _ENCODER_CODEC.get(codec_settings[codec_settings.index("-c:a") + 1])
+    
+    if FFPROBE_PATH is None or target_codec is None or "-q:a" in codec_settings:
+        return None
+    if os.path.splitext(input_file)[1].lower() not in _CODEC_CONTAINERS[target_codec]:
+        return None
+    return target_codec
+
+def _choose_codec_settings(codec_settings, target_codec, probe):
+    """Pick a stream copy over codec_settings when the probed stream already matches the target"""
+    if probe is None or probe[0] != target_codec:
+        return codec_settings
+    
+    if "-b:a" in codec_settings:
+        target_bitrate = _parse_bitrate(codec_settings[codec_settings.index("-b:a") + 1])
+        if probe[1] is None or abs(probe[1] - target_bitrate) > target_bitrate * BITRATE_TOLERANCE:
+            return codec_settings
+    
+    return ["-c:a", "copy"]
+
+def get_file_codec_settings(input_file, output_format, quality=None, threads=0):
+    """Get the codec arguments for converting a file
+    
+    If the file's audio is already in the target codec at the requested bitrate, the
+    stream is copied instead of being re-encoded.
+    """
+    codec_settings = get_codec_settings(output_format, quality, threads)
+    target_codec = _copy_candidate_codec(input_file, codec_settings)
+    if target_codec is None:
+        return codec_settings
+    return _choose_codec_settings(codec_settings, target_codec, _probe(input_file))
 
-def convert_file(input_file, output_file=None, quality=5, format=None):
+async def get_file_codec_settings_async(input_file, output_format, quality=None, threads=0):
+    """Async counterpart of get_file_codec_settings"""
+    codec_settings = get_codec_settings(output_format, quality, threads)
+    target_codec = _copy_candidate_codec(input_file, codec_settings)
+    if target_codec is None:
+        return codec_settings
+    return _choose_codec_settings(codec_settings, target_codec, await _probe_async(input_file))
+
+def convert_file(input_file, output_file=None, quality=5, format=None, threads=0, show_progress=True,
+                 overwrite=False):
     """Convert a single audio file to the specified format"""
     if not os.path.isfile(input_file):
         print_error(f"The file '{input_file}' does not exist.")
@@ -97,69 +401,218 @@ def convert_file(input_file, output_file=None, quality=5, format=None):
     if output_file is None:
         output_file = os.path.splitext(input_file)[0] + output_format
     
+    if not overwrite and os.path.exists(output_file):
+        print_error(f"The file '{output_file}' already exists. Use --force to overwrite it.")
+        return False
+    
     print_info(f"Converting: {os.path.basename(input_file)} → {os.path.basename(output_file)}")
     
     # Get codec settings for the output format
-    codec_settings = get_output_codec(output_format)
-    
-    # Add quality parameter if applicable
-    if "-q:a" in codec_settings and quality is not None:
-        q_index = codec_settings.index("-q:a")
-        if q_index + 1 < len(codec_settings):
-            codec_settings[q_index + 1] = str(quality)
+    codec_settings = get_file_codec_settings(input_file, output_format, quality, threads)
     
     # Build the ffmpeg command
-    ffmpeg_cmd = ["ffmpeg", "-i", input_file]
+    ffmpeg_cmd = [FFMPEG, "-y" if overwrite else "-n", *FFMPEG_LOG_ARGS, "-i", input_file, *AUDIO_ONLY_ARGS]
     ffmpeg_cmd.extend(codec_settings)
     ffmpeg_cmd.append(output_file)
     
-    # Run ffmpeg with capture_output to handle its logs
+    def on_progress(out_time):
+        print(f"\r{C.CYAN}[PROCESSING]{C.RESET} {out_time}", end="", flush=True)
+    
+    def clear_progress():
+        if show_progress:
+            print(f"\r{' ' * 50}\r", end="")
+    
     try:
         # Use a progress indicator
-        print(f"{Fore.CYAN}[PROCESSING]{Style.RESET_ALL} ", end="", flush=True)
+        if show_progress:
+            print(f"{C.CYAN}[PROCESSING]{C.RESET} ", end="", flush=True)
         
-        result = subprocess.run(
-            ffmpeg_cmd,
-            capture_output=True,
-            text=True
-        )
+        returncode, log_tail = _run_ffmpeg(ffmpeg_cmd, on_progress if show_progress else None)
         
         # Check for any errors
-        if result.returncode != 0:
-            print(f"\r{' ' * 50}\r", end="")  # Clear progress line
+        if returncode != 0:
+            clear_progress()
             print_error(f"FFmpeg conversion failed for '{input_file}'")
             print_warn("FFmpeg error details:")
-            for line in result.stderr.splitlines()[-5:]:  # Show last few lines of error
-                print(f"  {line}")
+            for line in log_tail:  # Show last few lines of error
+                tqdm.write(f"  {line}")
             return False
         
-        print(f"\r{' ' * 50}\r", end="")  # Clear progress line
+        clear_progress()
         print_success(f"Successfully converted to {os.path.basename(output_file)}")
         return True
     except Exception as e:
-        print(f"\r{' ' * 50}\r", end="")  # Clear progress line
+        clear_progress()
         print_error(f"An error occurred: {str(e)}")
         return False
 
-def convert_folder(folder_path, quality=5, format="ogg"):
-    """Convert all audio files in a folder to the specified format"""
+def _partial_path(output_file):
+    """Get a unique temporary path a batch writes an output to until FFmpeg succeeds"""
+    folder, filename = os.path.split(output_file)
+    stem, ext = os.path.splitext(filename)
+    return os.path.join(folder, f".{stem}.{uuid.uuid4().hex}.part{ext}")
+
+def _build_batch_command(tasks, partial_files, codec_settings):
+    """Build a single FFmpeg command that converts every task to its partial output
+    
+    codec_settings holds the codec arguments for each task, so a batch can mix
+    stream copies with re-encodes.
+    """
+    # -n keeps FFmpeg from touching any existing file, so every partial file that exists
+    # afterwards was created by this command
+    ffmpeg_cmd = [FFMPEG, "-n", *FFMPEG_LOG_ARGS]
+    for input_file, _, _, _ in tasks:
+        ffmpeg_cmd.extend(["-i", input_file])
+    for i, (partial_file, task_codec_settings) in enumerate(zip(partial_files, codec_settings)):
+        # Tags and chapters come from the first input unless mapped per output
+        ffmpeg_cmd.extend(["-map", f"{i}:a:0", "-map_metadata", str(i), "-map_chapters", str(i), *AUDIO_ONLY_ARGS])
+        ffmpeg_cmd.extend(task_codec_settings)
+        ffmpeg_cmd.append(partial_file)
+    return ffmpeg_cmd
+
+async def convert_batch(tasks, threads=0, on_progress=None, overwrite=False, codec_settings=None):
+    """Convert several files with a single FFmpeg process
+    
+    Each task is an (input_file, output_file, quality, format) tuple for an existing
+    input file and all tasks must share the same output format. Files that can be
+    stream-copied are probed here, while other batches convert. If FFmpeg fails, the
+    files are converted again one at a time so a single bad file does not fail the
+    whole batch. on_progress is called with FFmpeg's output time as it advances.
+    Failures are reported once the batch is done so output from batches running
+    side by side stays grouped. Returns a list with the result for each task.
+    
+    FFmpeg writes to uniquely named partial files that are only renamed to the real
+    output names once the batch succeeds, so a failed batch never overwrites or
+    removes files it didn't create.
+    """
+    if codec_settings is None:
+        codec_settings = []
+        for input_file, _, quality, format in tasks:
+            codec_settings.append(
+                await get_file_codec_settings_async(input_file, f".{format.lower()}", quality, threads)
+            )
+    
+    partial_files = [_partial_path(output_file) for _, output_file, _, _ in tasks]
+    
+    try:
+        returncode, log_tail = await _run_ffmpeg_async(
+            _build_batch_command(tasks, partial_files, codec_settings),
+            on_progress
+        )
+    except Exception as e:
+        returncode, log_tail = None, [f"An error occurred: {str(e)}"]
+    
+    if returncode == 0:
+        results = []
+        for (_, output_file, _, _), partial_file in zip(tasks, partial_files):
+            try:
+                if not overwrite and os.path.exists(output_file):
+                    os.remove(partial_file)
+                    print_error(f"The file '{output_file}' already exists. Use --force to overwrite it.")
+                    results.append(False)
+                else:
+                    os.replace(partial_file, output_file)
+                    results.append(True)
+            except OSError as e:
+                print_error(f"An error occurred: {str(e)}")
+                results.append(False)
+        return results
+    
+    for partial_file in partial_files:
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+    
+    if len(tasks) > 1:
+        print_warn(f"Batch conversion of {len(tasks)} files failed, converting them one at a time.")
+        results = []
+        for task, task_codec_settings in zip(tasks, codec_settings):
+            results.extend(await convert_batch([task], threads, on_progress, overwrite, [task_codec_settings]))
+        return results
+    
+    print_error(f"FFmpeg conversion failed for '{tasks[0][0]}'")
+    print_warn("FFmpeg error details:")
+    for line in log_tail:  # Show last few lines of error
+        tqdm.write(f"  {line}")
+    return [False]
+
+def _scan_audio_files(folder_path, recursive=False):
+    """Find files in a folder that are likely audio files, bucketed by extension"""
+    buckets = defaultdict(list)
+    
+    def add_file(filename, path):
+        # Check if file is likely an audio file (we'll let FFmpeg decide if it can convert it)
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext and (file_ext in AUDIO_EXT_SET or file_ext not in NON_AUDIO_EXT_SET):
+            buckets[file_ext].append(path)
+    
+    if recursive:
+        for root, _, files in os.walk(folder_path):
+            for filename in files:
+                add_file(filename, os.path.join(root, filename))
+    else:
+        # scandir reports file types without extra stat calls
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                if entry.is_file():
+                    add_file(entry.name, entry.path)
+    
+    return buckets
+
+def _make_batches(tasks, jobs):
+    """Group tasks by input extension and codec settings into batches for convert_batch
+    
+    Grouping doesn't probe files, stream copies are decided later by convert_batch.
+    """
+    groups = {}
+    for task in tasks:
+        input_file, _, quality, format = task
+        key = (os.path.splitext(input_file)[1].lower(), *get_codec_settings(f".{format.lower()}", quality))
+        groups.setdefault(key, []).append(task)
+    
+    # Keep batches small enough that every job gets work to do
+    batch_size = max(1, min(MAX_BATCH_SIZE, -(-len(tasks) // jobs)))
+    
+    batches = []
+    for group in groups.values():
+        for i in range(0, len(group), batch_size):
+            batches.append(group[i:i + batch_size])
+    return batches
+
+async def _convert_batches(batches, jobs, overwrite=False):
+    """Convert batches with at most `jobs` FFmpeg processes running at once"""
+    semaphore = asyncio.Semaphore(jobs)
+    total_tasks = sum(len(batch) for batch in batches)
+    
+    # One thread per FFmpeg process keeps parallel jobs from oversubscribing the CPU
+    threads = 0 if jobs == 1 else 1
+    
+    results = []
+    with tqdm(total=total_tasks, unit="file", disable=None) as progress_bar:
+        # With a single job the bar also shows how far the running batch has got
+        on_progress = progress_bar.set_postfix_str if jobs == 1 else None
+        
+        async def convert_one(batch):
+            async with semaphore:
+                return await convert_batch(batch, threads, on_progress, overwrite)
+        
+        for future in asyncio.as_completed([convert_one(batch) for batch in batches]):
+            batch_results = await future
+            results.extend(batch_results)
+            progress_bar.update(len(batch_results))
+    return results
+
+def convert_folder(folder_path, quality=5, format="ogg", jobs=None, recursive=False, overwrite=False):
+    """Convert all audio files in a folder, and optionally its subfolders, to the specified format"""
     if not os.path.isdir(folder_path):
         print_error(f"The folder '{folder_path}' does not exist.")
         return False
     
     output_format = f".{format.lower()}"
+    jobs = jobs or os.cpu_count() or 1
     
     # Get all audio files in the folder
-    all_files = os.listdir(folder_path)
-    audio_files = []
-    
-    # Check if file is likely an audio file (we'll let FFmpeg decide if it can convert it)
-    for filename in all_files:
-        file_ext = os.path.splitext(filename)[1].lower()
-        if file_ext and (file_ext in COMMON_AUDIO_FORMATS or file_ext not in [".txt", ".jpg", ".png", ".pdf", ".doc", ".docx", ".exe", ".zip"]):
-            audio_files.append(filename)
-    
-    total_files = len(audio_files)
+    buckets = _scan_audio_files(folder_path, recursive)
+    total_files = sum(len(paths) for paths in buckets.values())
     
     if total_files == 0:
         print_warn(f"No potential audio files found in '{folder_path}'.")
@@ -171,43 +624,72 @@ def convert_folder(folder_path, quality=5, format="ogg"):
     skip_count = 0
     fail_count = 0
     
-    for i, filename in enumerate(audio_files):
-        input_file = os.path.join(folder_path, filename)
-        
+    tasks = []
+    already_converted = 0
+    planned_outputs = {}
+    for file_ext, paths in buckets.items():
         # Skip files that are already in the target format
-        if filename.lower().endswith(output_format):
-            print_info(f"[{i+1}/{total_files}] Skipping: {filename} (already in target format)")
-            skip_count += 1
+        if file_ext == output_format:
+            print_info(f"Skipping {len(paths)} file(s) already in target format.")
+            skip_count += len(paths)
             continue
-            
-        output_file = os.path.join(folder_path, os.path.splitext(filename)[0] + output_format)
         
-        # Calculate percentage for progress display
-        percent = int((i / total_files) * 100)
-        print_info(f"[{i+1}/{total_files}] ({percent}%) Processing: {filename}")
-        
-        if convert_file(input_file, output_file, quality, format):
-            success_count += 1
-        else:
-            fail_count += 1
-    
-    # Print summary
-    print()
-    print(f"{Fore.CYAN}╔══════════════════════════════════════════╗")
-    print(f"║ {Fore.WHITE}Conversion Summary{Fore.CYAN}                      ║")
-    print(f"╠══════════════════════════════════════════╣")
-    print(f"║ {Fore.WHITE}Total files:    {Fore.GREEN}{total_files:<5}{Fore.CYAN}                   ║")
-    print(f"║ {Fore.WHITE}Converted:      {Fore.GREEN}{success_count:<5}{Fore.CYAN}                   ║")
-    print(f"║ {Fore.WHITE}Skipped:        {Fore.YELLOW}{skip_count:<5}{Fore.CYAN}                   ║")
-    print(f"║ {Fore.WHITE}Failed:         {Fore.RED}{fail_count:<5}{Fore.CYAN}                   ║")
-    print(f"║ {Fore.WHITE}Success rate:   {Fore.GREEN}{int((success_count/(total_files-skip_count))*100) if (total_files-skip_count) > 0 else 0}%{Fore.CYAN}                     ║")
-    print(f"╚══════════════════════════════════════════╝{Style.RESET_ALL}")
+        for input_file in paths:
+            output_file = os.path.splitext(input_file)[0] + output_format
+            
+            # Skip files that were already converted unless asked to overwrite them
+            if not overwrite and os.path.exists(output_file):
+                already_converted += 1
+                continue
+            
+            # Skip files whose output name is already taken by another file in this run, e.g. x.wav and x.flac
+            output_key = os.path.normcase(output_file)
+            if output_key in planned_outputs:
+                print_warn(f"Skipping: {os.path.relpath(input_file, folder_path)} "
+                           f"(output {os.path.basename(output_file)} is also the output of "
+                           f"{os.path.relpath(planned_outputs[output_key], folder_path)})")
+                skip_count += 1
+                continue
+            planned_outputs[output_key] = input_file
+            
+            tasks.append((input_file, output_file, quality, format))
+    
+    if already_converted:
+        print_info(f"Skipping {already_converted} file(s) whose output already exists. Use --force to overwrite them.")
+        skip_count += already_converted
+    
+    total_tasks = len(tasks)
+    batches = _make_batches(tasks, jobs)
+    
+    if total_tasks > 0:
+        print_info(f"Converting {total_tasks} files with {jobs} parallel job(s).")
+        results = asyncio.run(_convert_batches(batches, jobs, overwrite))
+        success_count = results.count(True)
+        fail_count = results.count(False)
+    
+    attempted = total_files - skip_count
+    success_rate = int((success_count / attempted) * 100) if attempted > 0 else 0
+    
+    # Print summary in a single write
+    summary = [
+        "",
+        f"{C.CYAN}╔{'═' * BOX_WIDTH}╗",
+        _box_line("Conversion Summary", C.WHITE),
+        f"╠{'═' * BOX_WIDTH}╣",
+        _box_row("Total files:", total_files, C.GREEN),
+        _box_row("Converted:", success_count, C.GREEN),
+        _box_row("Skipped:", skip_count, C.YELLOW),
+        _box_row("Failed:", fail_count, C.RED),
+        _box_row("Success rate:", f"{success_rate}%", C.GREEN),
+        f"╚{'═' * BOX_WIDTH}╝{C.RESET}",
+    ]
+    sys.stdout.write("\n".join(summary) + "\n")
     
     return success_count > 0
 
 def list_supported_formats():
     """List common audio formats supported by FFmpeg"""
-    print(f"\n{Fore.CYAN}Commonly Supported Audio Formats:{Style.RESET_ALL}")
+    lines = [f"\n{C.CYAN}Commonly Supported Audio Formats:{C.RESET}"]
     formats = []
     for fmt in COMMON_AUDIO_FORMATS:
         formats.append(fmt.lstrip('.'))
@@ -217,10 +699,11 @@ def list_supported_formats():
     num_cols = 5
     for i in range(0, len(formats), num_cols):
         row = formats[i:i+num_cols]
-        print("  " + "".join(f"{fmt:<{col_width}}" for fmt in row))
+        lines.append("  " + "".join(f"{fmt:<{col_width}}" for fmt in row))
     
-    print(f"\n{Fore.YELLOW}Note:{Style.RESET_ALL} Actual support depends on your FFmpeg installation.")
-    print(f"For a complete list, run: {Fore.GREEN}ffmpeg -formats{Style.RESET_ALL}\n")
+    lines.append(f"\n{C.YELLOW}Note:{C.RESET} Actual support depends on your FFmpeg installation.")
+    lines.append(f"For a complete list, run: {C.GREEN}ffmpeg -formats{C.RESET}\n")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def main():
     # Print program banner
@@ -241,6 +724,12 @@ Examples:
   # Convert all audio files in a directory to FLAC
   %(prog)s -d /path/to/music --format flac
   
+  # Convert a directory and all of its subdirectories to MP3
+  %(prog)s -d /path/to/music --format mp3 --recursive
+  
+  # Convert a directory using 4 parallel jobs
+  %(prog)s -d /path/to/music --format mp3 --jobs 4
+  
   # Convert with specified output name
   %(prog)s -f input.wav -o output.mp3
   
@@ -255,25 +744,33 @@ Examples:
     input_group.add_argument("-d", "--directory", metavar="DIR", help="Convert all audio files in a directory")
     input_group.add_argument("--list-formats", action="store_true", help="List commonly supported audio formats")
     
+    parser.add_argument("-r", "--recursive", action="store_true",
+                      help="Also convert audio files in subdirectories (only used with --directory)")
     parser.add_argument("-o", "--output", metavar="OUTPUT", help="Output file name (only used with --file)")
     parser.add_argument("--format", metavar="FORMAT", default="ogg", 
                       help="Output format (e.g., mp3, flac, ogg, wav) (default: ogg)")
     parser.add_argument("-q", "--quality", type=int, default=5, choices=range(0, 11), 
                       help="Quality setting (0-10, default: 5, where applicable)")
+    parser.add_argument("--force", action="store_true",
+                      help="Overwrite output files that already exist (default: skip them)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, metavar="N",
+                      help="Number of files to convert in parallel with --directory (default: number of CPU cores)")
     parser.add_argument("-v", "--version", action="version", 
                       version=f"{PROGRAM_NAME} v{VERSION}")
     
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    
     # If no arguments or only help requested, show help
     if len(sys.argv) == 1:
         parser.print_help()
         return 0
     
     # Check if ffmpeg is installed
-    try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
-    except FileNotFoundError:
+    caps = _get_ffmpeg_caps()
+    if caps is None or not caps["version_ok"]:
         print_error("FFmpeg is not installed or not in the system PATH.")
         print_info("Please install FFmpeg to use this converter: https://ffmpeg.org/download.html")
         return 1
@@ -294,14 +791,16 @@ Examples:
             # Add format extension to output if not present
             args.output = f"{args.output}.{args.format}"
         
-        success = convert_file(args.file, args.output, args.quality, args.format)
+        success = convert_file(args.file, args.output, args.quality, args.format,
+                               show_progress=_USE_COLOR, overwrite=args.force)
         print()
         if success:
             print_success("File conversion completed successfully!")
         else:
             print_error("File conversion failed.")
     elif args.directory:
-        success = convert_folder(args.directory, args.quality, args.format)
+        success = convert_folder(args.directory, args.quality, args.format, args.jobs, args.recursive,
+                                 args.force)
     
     return 0 if success else 1
 
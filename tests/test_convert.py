@@ -0,0 +1,162 @@
+import asyncio
+import os
+
+import convert
+
+
+def test_batch_command_maps_metadata_and_chapters_per_input():
+    tasks = [
+        ("a.mp3", "a.ogg", 5, "ogg"),
+        ("b.mp3", "b.ogg", 5, "ogg"),
+    ]
+    partial_files = [convert._partial_path(output_file) for _, output_file, _, _ in tasks]
+    codec_settings = [convert.get_codec_settings(".ogg", 5)] * len(tasks)
+    cmd = convert._build_batch_command(tasks, partial_files, codec_settings)
+
+    for i, partial_file in enumerate(partial_files):
+        map_index = cmd.index(f"{i}:a:0")
+        output_index = cmd.index(partial_file)
+        output_args = cmd[map_index:output_index]
+        assert output_args[output_args.index("-map_metadata") + 1] == str(i)
+        assert output_args[output_args.index("-map_chapters") + 1] == str(i)
+
+
+def test_make_batches_groups_by_input_extension():
+    tasks = [
+        ("a.mp3", "a.ogg", 5, "ogg"),
+        ("b.wav", "b.ogg", 5, "ogg"),
+        ("c.mp3", "c.ogg", 5, "ogg"),
+    ]
+    batches = convert._make_batches(tasks, jobs=1)
+
+    assert sorted(len(batch) for batch in batches) == [1, 2]
+    for batch in batches:
+        assert len({task[0][-4:] for task in batch}) == 1
+
+
+def test_failed_batch_only_removes_its_own_partial_files(tmp_path, monkeypatch):
+    tasks = []
+    for name in ("a", "b"):
+        input_file = tmp_path / f"{name}.mp3"
+        input_file.write_text("audio")
+        tasks.append((str(input_file), str(tmp_path / f"{name}.ogg"), 5, "ogg"))
+
+    # An output finished by another batch must survive this batch failing
+    other_output = tmp_path / "b.ogg"
+    other_output.write_text("converted elsewhere")
+
+    async def fail_batch(ffmpeg_cmd, on_progress=None):
+        for arg in ffmpeg_cmd:
+            if ".part" in arg:
+                open(arg, "w").close()
+        return 1, ["Invalid data found"]
+
+    monkeypatch.setattr(convert, "_run_ffmpeg_async", fail_batch)
+    results = asyncio.run(convert.convert_batch(tasks))
+
+    assert results == [False, False]
+    assert other_output.read_text() == "converted elsewhere"
+    assert not any(".part" in name for name in os.listdir(tmp_path))
+
+
+def test_convert_folder_skips_inputs_sharing_an_output(tmp_path, monkeypatch):
+    for name in ("x.wav", "x.flac", "y.mp3"):
+        (tmp_path / name).write_text("audio")
+
+    converted = []
+
+    async def convert_batches(batches, jobs, overwrite=False):
+        tasks = [task for batch in batches for task in batch]
+        converted.extend(tasks)
+        return [True] * len(tasks)
+
+    monkeypatch.setattr(convert, "_convert_batches", convert_batches)
+    assert convert.convert_folder(str(tmp_path), format="ogg", jobs=2, overwrite=True)
+
+    outputs = [output_file for _, output_file, _, _ in converted]
+    assert sorted(os.path.basename(output) for output in outputs) == ["x.ogg", "y.ogg"]
+
+
+def test_quality_based_formats_are_never_stream_copied(monkeypatch):
+    monkeypatch.setattr(convert, "FFPROBE_PATH", "ffprobe")
+    monkeypatch.setattr(convert, "_probe", lambda input_file: ("vorbis", 128000))
+
+    codec_settings = convert.get_file_codec_settings("a.ogg", ".ogg", quality=9)
+
+    assert codec_settings[:4] == ["-c:a", "libvorbis", "-q:a", "9"]
+
+
+def test_matching_codec_and_bitrate_is_stream_copied(monkeypatch):
+    monkeypatch.setattr(convert, "FFPROBE_PATH", "ffprobe")
+    monkeypatch.setattr(convert, "_probe", lambda input_file: ("aac", 191000))
+
+    assert convert.get_file_codec_settings("a.m4a", ".aac") == ["-c:a", "copy"]
+
+
+def test_batch_leaves_files_named_like_partial_outputs_alone(tmp_path, monkeypatch):
+    input_file = tmp_path / "song.wav"
+    input_file.write_text("audio")
+    user_file = tmp_path / "song.part.ogg"
+    user_file.write_text("user data")
+    tasks = [(str(input_file), str(tmp_path / "song.ogg"), 5, "ogg")]
+
+    commands = []
+
+    async def run_ffmpeg(ffmpeg_cmd, on_progress=None):
+        commands.append(ffmpeg_cmd)
+        open(ffmpeg_cmd[-1], "w").close()
+        return len(commands) - 1, []
+
+    monkeypatch.setattr(convert, "_run_ffmpeg_async", run_ffmpeg)
+
+    # First run succeeds, second run fails
+    assert asyncio.run(convert.convert_batch(tasks)) == [True]
+    os.remove(tmp_path / "song.ogg")
+    assert asyncio.run(convert.convert_batch(tasks)) == [False]
+
+    assert user_file.read_text() == "user data"
+    assert str(user_file) not in commands[0] + commands[1]
+    assert sorted(os.listdir(tmp_path)) == ["song.part.ogg", "song.wav"]
+
+
+def test_make_batches_does_not_probe_files(monkeypatch):
+    def probe(input_file):
+        raise AssertionError("files must not be probed while grouping")
+
+    monkeypatch.setattr(convert, "FFPROBE_PATH", "ffprobe")
+    monkeypatch.setattr(convert, "_probe", probe)
+    monkeypatch.setattr(convert, "_probe_async", probe)
+    tasks = [("a.m4a", "a.aac", 5, "aac"), ("b.m4a", "b.aac", 5, "aac")]
+
+    assert convert._make_batches(tasks, jobs=1) == [tasks]
+
+
+def test_batch_probes_files_and_mixes_copies_with_encodes(tmp_path, monkeypatch):
+    tasks = []
+    for name in ("copied", "encoded"):
+        input_file = tmp_path / f"{name}.m4a"
+        input_file.write_text("audio")
+        tasks.append((str(input_file), str(tmp_path / f"{name}.aac"), 5, "aac"))
+
+    async def probe(input_file):
+        return ("aac", 192000) if "copied" in input_file else ("alac", None)
+
+    commands = []
+
+    async def run_ffmpeg(ffmpeg_cmd, on_progress=None):
+        commands.append(ffmpeg_cmd)
+        for arg in ffmpeg_cmd:
+            if ".part" in arg:
+                open(arg, "w").close()
+        return 0, []
+
+    monkeypatch.setattr(convert, "FFPROBE_PATH", "ffprobe")
+    monkeypatch.setattr(convert, "_probe_async", probe)
+    monkeypatch.setattr(convert, "_run_ffmpeg_async", run_ffmpeg)
+
+    assert asyncio.run(convert.convert_batch(tasks)) == [True, True]
+    cmd = commands[0]
+    copied_args = cmd[cmd.index("0:a:0"):cmd.index("1:a:0")]
+    encoded_args = cmd[cmd.index("1:a:0"):]
+    assert copied_args[-4:-2] == ["-c:a", "copy"]
+    assert encoded_args[encoded_args.index("-c:a") + 1] == "aac"
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+import convert
+
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    """Point convert at a fake FFmpeg binary and a temporary cache directory"""
+    binary = tmp_path / "bin" / "ffmpeg"
+    binary.parent.mkdir()
+    binary.write_text("fake ffmpeg")
+    cache_dir = tmp_path / "cache"
+
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        stdout = "File formats:\n DE mp3 MP3\n" if "-formats" in cmd else "ffmpeg version fake\n"
+        return subprocess.CompletedProcess(cmd, 0, stdout, "")
+
+    monkeypatch.setattr(convert, "FFMPEG_PATH", str(binary))
+    monkeypatch.setattr(convert, "FFMPEG", str(binary))
+    monkeypatch.setattr(convert, "get_cache_dir", lambda: str(cache_dir))
+    monkeypatch.setattr(convert.subprocess, "run", run)
+    return binary, cache_dir / "ffmpeg_caps.json", calls
+
+
+def test_caps_are_cached_between_calls(ffmpeg):
+    _, cache_file, calls = ffmpeg
+
+    caps = convert._get_ffmpeg_caps()
+    assert caps["version_ok"] is True
+    assert "mp3" in caps["formats"]
+    assert len(calls) == 2
+    assert cache_file.exists()
+
+    assert convert._get_ffmpeg_caps() == caps
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("change", ["mtime", "size"])
+def test_cache_is_invalidated_when_binary_changes(ffmpeg, change):
+    binary, _, calls = ffmpeg
+    convert._get_ffmpeg_caps()
+
+    if change == "mtime":
+        stat = os.stat(binary)
+        os.utime(binary, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    else:
+        binary.write_text("a different fake ffmpeg")
+
+    convert._get_ffmpeg_caps()
+    assert len(calls) == 4
+
+
+@pytest.mark.parametrize("content", ["{not json", "[1, 2, 3]", "null", '{"key": null}'])
+def test_unusable_cache_file_is_reprobed_and_replaced(ffmpeg, content):
+    _, cache_file, calls = ffmpeg
+    cache_file.parent.mkdir()
+    cache_file.write_text(content)
+
+    caps = convert._get_ffmpeg_caps()
+
+    assert caps["version_ok"] is True
+    assert len(calls) == 2
+    assert json.loads(cache_file.read_text()) == caps
+
+
+def test_unwritable_cache_directory_still_returns_caps(ffmpeg, monkeypatch, tmp_path):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    monkeypatch.setattr(convert, "get_cache_dir", lambda: str(blocker / "cache"))
+
+    caps = convert._get_ffmpeg_caps()
+
+    assert caps["version_ok"] is True
+
+
+def test_failed_cache_write_removes_temp_file(ffmpeg, monkeypatch):
+    _, cache_file, _ = ffmpeg
+
+    def failing_dump(obj, f):
+        f.write('{"key": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(convert.json, "dump", failing_dump)
+    caps = convert._get_ffmpeg_caps()
+
+    assert caps["version_ok"] is True
+    assert os.listdir(cache_file.parent) == []
+
+
+def test_missing_ffmpeg_is_not_probed(ffmpeg, monkeypatch):
+    _, _, calls = ffmpeg
+    monkeypatch.setattr(convert, "FFMPEG_PATH", None)
+
+    assert convert._get_ffmpeg_caps() is None
+    assert calls == []